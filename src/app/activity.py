@@ -0,0 +1,83 @@
+import datetime
+import functools
+
+import numpy as np
+
+import datasets
+
+# Daily activity is a sweep over permit start/end events: +1 on the start day,
+# -1 the day after the end day, prefix summed into active permits per day.
+# The per-filter series is cached, so any date range is an O(days) slice.
+
+@functools.lru_cache(maxsize=None)
+def load_permit_events() -> tuple:
+    """
+    Function to reduce permit blocks to one start/end day offset per permit.
+    """
+    import pandas as pd
+
+    df = datasets.load_film_df()
+    permits = df.drop_duplicates('id_')[['id_', 'startdate', 'enddate', 'origin', 'category', 'subcategory']]
+    permits = permits.reset_index(drop=True)
+
+    startdays = pd.to_datetime(permits['startdate']).values.astype('datetime64[D]')
+    enddays = pd.to_datetime(permits['enddate']).values.astype('datetime64[D]')
+    enddays = np.maximum(startdays, enddays)
+    first_day = startdays.min()
+
+    permits['start_idx'] = (startdays - first_day).astype('int64')
+    permits['end_idx'] = (enddays - first_day).astype('int64')
+
+    return permits, first_day.item()
+
+@functools.lru_cache(maxsize=64)
+def active_counts(origin: str, category: str, subcat: str) -> np.ndarray:
+    """
+    Function to return the number of active permits per day (from the first
+    permit day) for a set of filters.
+    """
+    permits, _ = load_permit_events()
+
+    mask = np.ones(len(permits), dtype=bool)
+    if (origin != None) and (origin != 'ALL'):
+        mask &= (permits['origin'] == origin).to_numpy()
+    if (category != None) and (category != 'ALL'):
+        mask &= (permits['category'] == category).to_numpy()
+    if (subcat != None) and (subcat != 'ALL'):
+        mask &= (permits['subcategory'] == subcat).to_numpy()
+
+    n_days = int(permits['end_idx'].max()) + 1
+    starts = permits['start_idx'].to_numpy()[mask]
+    ends = permits['end_idx'].to_numpy()[mask]
+
+    # Difference array, one extra slot for permits ending on the last day
+    diff = np.bincount(starts, minlength=n_days + 1) - np.bincount(ends + 1, minlength=n_days + 1)
+    counts = np.cumsum(diff[:n_days])
+    counts.flags.writeable = False
+
+    return counts
+
+def daily_activity(
+    startdate: datetime.date,
+    enddate: datetime.date,
+    origin: str,
+    category: str,
+    subcat: str) -> tuple:
+    """
+    Function to return days and active permit counts between two dates (inclusive).
+    """
+    _, first_day = load_permit_events()
+    counts = active_counts(origin, category, subcat)
+
+    start_idx = max((startdate - first_day).days, 0)
+    end_idx = min((enddate - first_day).days, len(counts) - 1)
+    if start_idx > end_idx:
+        return [], []
+
+    days = np.arange(
+        np.datetime64(first_day) + start_idx,
+        np.datetime64(first_day) + end_idx + 1,
+        dtype='datetime64[D]'
+    ).astype(str).tolist()
+
+    return days, counts[start_idx:end_idx + 1].tolist()
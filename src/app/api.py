@@ -0,0 +1,208 @@
+from flask import Blueprint, Response, abort, jsonify, request, stream_with_context, url_for
+from werkzeug.exceptions import HTTPException
+
+import base64
+import datetime
+import hashlib
+import json
+
+import datasets
+import filters
+
+# Read-only query API on the Dash Flask server. Filters mirror pick_dates,
+# pages are streamed feature by feature and ETags change with the dataset files.
+# Pagination is keyset based: the cursor is the opaque last row id (block id or
+# zip code) of the previous page, rows are returned in id order.
+
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+MEDIA_TYPES = {
+    'geojson': 'application/geo+json',
+    'ndjson': 'application/x-ndjson'
+}
+
+api = Blueprint('api', __name__, url_prefix='/api')
+
+@api.errorhandler(HTTPException)
+def json_error(error: HTTPException):
+    """
+    Errors as JSON bodies instead of Flask's HTML pages.
+    """
+    return jsonify({'error': error.name, 'message': error.description}), error.code
+
+def _encode_cursor(key) -> str:
+    """
+    Helper function to encode a row id as an opaque cursor.
+    """
+    key = key.item() if hasattr(key, 'item') else key
+
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def _parse_cursor():
+    """
+    Helper function to decode the cursor query parameter to a row id.
+    """
+    value = request.args.get('cursor')
+    if value == None:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(value.encode()))
+    except ValueError:
+        abort(400, description='cursor is not valid')
+
+def _parse_date(name: str, default: str) -> datetime.date:
+    """
+    Helper function to parse a YYYY-MM-DD query parameter.
+    """
+    value = request.args.get(name, default)
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        abort(400, description=f'{name} must be YYYY-MM-DD')
+
+def _parse_int(name: str, default: int, minimum: int, maximum: int | None = None) -> int:
+    """
+    Helper function to parse a bounded integer query parameter.
+    """
+    try:
+        value = int(request.args.get(name, default))
+    except ValueError:
+        abort(400, description=f'{name} must be an integer')
+    if (value < minimum) or ((maximum != None) and (value > maximum)):
+        abort(400, description=f'{name} out of range')
+
+    return value
+
+def _parse_bbox() -> tuple | None:
+    """
+    Helper function to parse a minx,miny,maxx,maxy (longitude, latitude) query parameter.
+    """
+    value = request.args.get('bbox')
+    if value == None:
+        return None
+    try:
+        minx, miny, maxx, maxy = [ float(v) for v in value.split(',') ]
+    except ValueError:
+        abort(400, description='bbox must be minx,miny,maxx,maxy')
+
+    return (minx, miny, maxx, maxy)
+
+def _parse_args() -> dict:
+    """
+    Helper function to parse the filter and paging parameters shared by all routes.
+    """
+    metadata = datasets.load_metadata()
+    fmt = request.args.get('format', 'geojson')
+    if fmt not in MEDIA_TYPES:
+        abort(400, description=f'format must be one of {", ".join(MEDIA_TYPES)}')
+
+    return {
+        'startdate': _parse_date('start', metadata['min_date']),
+        'enddate': _parse_date('end', metadata['max_date']),
+        'origin': request.args.get('origin'),
+        'category': request.args.get('category'),
+        'subcat': request.args.get('subcategory'),
+        'bbox': _parse_bbox(),
+        'limit': _parse_int('limit', DEFAULT_LIMIT, 1, MAX_LIMIT),
+        'cursor': _parse_cursor(),
+        'format': fmt
+    }
+
+def _etag() -> str:
+    """
+    Helper function to derive an ETag from the dataset version and the query.
+    """
+    query = sorted(request.args.items(multi=True))
+    key = json.dumps([datasets.dataset_version(), request.path, query])
+
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def _stream_features(features, fmt: str, next_cursor: str | None):
+    """
+    Helper function to yield a page of features as GeoJSON or NDJSON chunks.
+    """
+    if fmt == 'ndjson':
+        for feature in features:
+            yield json.dumps(feature) + '\n'
+        return
+
+    yield '{"type": "FeatureCollection", "features": ['
+    for i, feature in enumerate(features):
+        yield (',' if i > 0 else '') + json.dumps(feature)
+    yield '], "next_cursor": ' + json.dumps(next_cursor) + '}'
+
+def _paginated_response(page, next_key, fmt: str, etag: str) -> Response:
+    """
+    Helper function to stream one keyset page of a (Geo)DataFrame.
+    """
+    next_cursor = None if next_key == None else _encode_cursor(next_key)
+
+    response = Response(
+        stream_with_context(_stream_features(page.iterfeatures(), fmt, next_cursor)),
+        mimetype=MEDIA_TYPES[fmt]
+    )
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    if next_cursor != None:
+        next_args = request.args.to_dict()
+        next_args['cursor'] = next_cursor
+        response.headers['Link'] = f'<{url_for(request.endpoint, _external=True, **next_args)}>; rel="next"'
+
+    return response
+
+def _not_modified(etag: str) -> Response | None:
+    """
+    Helper function to answer revalidation requests before touching the data.
+    """
+    # Weak comparison (RFC 7232), proxies may weaken the ETag, i.e. when compressing
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+
+    return response
+
+@api.route('/permits')
+def permits():
+    """
+    Permit blocks matching the filters as GeoJSON features (one per held block).
+    """
+    etag = _etag()
+    not_modified = _not_modified(etag)
+    if not_modified != None:
+        return not_modified
+
+    args = _parse_args()
+    if (args['cursor'] != None) and not isinstance(args['cursor'], int):
+        abort(400, description='cursor is not valid')
+    page, next_key = filters.filter_permits_page(
+        args['startdate'], args['enddate'], args['origin'], args['category'], args['subcat'], args['bbox'],
+        args['cursor'], args['limit']
+    )
+
+    return _paginated_response(filters.format_dates(page), next_key, args['format'], etag)
+
+@api.route('/zipcode-counts')
+def zipcode_counts():
+    """
+    Distinct permit counts per zip code for the filtered permit blocks.
+    """
+    etag = _etag()
+    not_modified = _not_modified(etag)
+    if not_modified != None:
+        return not_modified
+
+    args = _parse_args()
+    filtered_df = filters.filter_permits(
+        args['startdate'], args['enddate'], args['origin'], args['category'], args['subcat'], args['bbox']
+    )
+    counts = filters.zipcode_counts(filtered_df).sort_index()
+
+    # Counts are a small aggregate, paged by zip code over the full result
+    if args['cursor'] != None:
+        counts = counts.loc[counts.index > str(args['cursor'])]
+    page = counts.iloc[:args['limit']]
+    next_key = page.index[-1] if len(counts) > args['limit'] else None
+
+    return _paginated_response(page, next_key, args['format'], etag)
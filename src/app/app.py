@@ -1,15 +1,21 @@
-from dash import Dash, dcc, html, Input, Output
+from dash import Dash, DiskcacheManager, dcc, html, Input, Output, ctx
+from flask import request
 
-import geopandas as gpd
-import pandas as pd
 import datetime
+import diskcache
 import json
-import pickle
+import os
+import time
 
+import activity
+import api
+import datasets
+import filters
 import graphing_callbacks
 
-FILM_PERMITS = './data/film_df.p'
-ZIP_CODES = './data/zip_codes.p'
+CALLBACK_CACHE = './cache'
+MAX_BACKGROUND_JOBS = int(os.environ.get('MAX_BACKGROUND_JOBS', os.cpu_count() or 1))
+JOB_SLOTS = 'job-slots'
 BORO_DICT = {
     'New York': 'Manhattan',
     'Kings': 'Brooklyn',
@@ -19,29 +25,122 @@ BORO_DICT = {
 }
 
 external_stylesheets = ['https://taniarascia.github.io/primitive/css/main.css']
-app = Dash(__name__, external_stylesheets=external_stylesheets, suppress_callback_exceptions=True)
+
+# Heavy callbacks can run as background jobs in subprocesses (results on disk,
+# no broker). A new trigger of the same callback terminates its stale job, and
+# at most MAX_BACKGROUND_JOBS jobs compute at once across all workers.
+class DiskcacheJobManager(DiskcacheManager):
+    """
+    Class to limit concurrently computing jobs and to terminate stale jobs,
+    ignoring jobs that finish while being terminated (Dash checks the pid
+    exists, then opens it).
+    """
+    def terminate_job(self, job):
+        import psutil
+
+        try:
+            super().terminate_job(job)
+        except psutil.NoSuchProcess:
+            pass
+
+    def make_job_fn(self, fn, progress, key=None):
+        job_fn = super().make_job_fn(fn, progress, key)
+
+        def limited_job_fn(*args):
+            self.acquire_slot()
+            try:
+                job_fn(*args)
+            finally:
+                self.release_slot()
+
+        return limited_job_fn
+
+    def acquire_slot(self):
+        """
+        Method to wait (in the job process) until fewer than
+        MAX_BACKGROUND_JOBS jobs hold a slot. Slots of terminated jobs are
+        reclaimed by checking their pids.
+        """
+        pid = os.getpid()
+        while True:
+            with self.handle.transact():
+                holders = [ job for job in self.handle.get(JOB_SLOTS, []) if self.job_running(job) ]
+                if len(holders) < MAX_BACKGROUND_JOBS:
+                    self.handle.set(JOB_SLOTS, holders + [pid])
+                    return
+                self.handle.set(JOB_SLOTS, holders)
+            time.sleep(0.05)
+
+    def release_slot(self):
+        """
+        Method to give up the job process's slot.
+        """
+        pid = os.getpid()
+        with self.handle.transact():
+            holders = self.handle.get(JOB_SLOTS, [])
+            self.handle.set(JOB_SLOTS, [ job for job in holders if job != pid ])
+
+if graphing_callbacks.BACKGROUND_CALLBACKS:
+    background_callback_manager = DiskcacheJobManager(diskcache.Cache(CALLBACK_CACHE))
+else:
+    background_callback_manager = None
+
+app = Dash(
+    __name__,
+    external_stylesheets=external_stylesheets,
+    suppress_callback_exceptions=True,
+    background_callback_manager=background_callback_manager
+)
 server = app.server
+server.register_blueprint(api.api)
+
+def warm_filter_caches():
+    """
+    Function to load what pick_dates needs into this process.
+    """
+    datasets.preload()
+    filters.load_zipcode_incidence()
+
+def warm_conflict_caches():
+    """
+    Function to load what the map conflict overlay needs into this process.
+    """
+    import conflicts
 
-with open(FILM_PERMITS, 'rb') as f:
-    df = gpd.GeoDataFrame(pickle.load(f))
+    datasets.load_film_df()
+    conflicts.load_conflicts()
 
-with open(ZIP_CODES, 'rb') as f:
-    zip_codes = gpd.GeoDataFrame(pickle.load(f))
+def warm_caches():
+    """
+    Function to load the datasets and derived indexes into this process.
+    """
+    warm_filter_caches()
+    activity.load_permit_events()
 
-df['startdate'] = pd.to_datetime(df['startdate']).dt.date
-df['enddate'] = pd.to_datetime(df['enddate']).dt.date
-df['enteredon'] = pd.to_datetime(df['enteredon']).dt.date
-df['main_st'] = df['main_st'].map(lambda x: x.upper())
-df['cross_st_1'] = df['cross_st_1'].map(lambda x: x.upper())
-df['cross_st_2'] = df['cross_st_2'].map(lambda x: x.upper())
-df.rename(columns={'id': 'id_'}, inplace=True)
-df = gpd.GeoDataFrame(df[[
-    'id_', 'zipcode', 'startdate', 'enddate', 'category', 'subcategory', 'origin', 'main_st', 'cross_st_1', 'cross_st_2', 'geometry'
-]])
+# Layout is rendered from the metadata sidecar, datasets load on first use
+metadata = datasets.load_metadata()
+if os.environ.get('PRELOAD_DATA') == '1':
+    warm_caches()
 
-origin_options = ['ALL', *df['origin'].unique()]
-category_options = ['ALL', *df['category'].unique()]
-calender_options = [ i for i in range(df['startdate'].min().year, df['enddate'].max().year + 1) ]
+if graphing_callbacks.BACKGROUND_CALLBACKS:
+    @server.before_request
+    def warm_before_jobs():
+        # Background jobs fork from this worker, so load what a job needs here
+        # (once) when it is started. Polls and other callbacks skip this.
+        if (not request.path.endswith('_dash-update-component')) or ('job' in request.args):
+            return
+        body = request.get_json(silent=True) or {}
+        output = body.get('output', '')
+        if 'filtered-shoots-store.data' in output:
+            warm_filter_caches()
+        elif 'film-map.figure' in output:
+            inputs = { i.get('id'): i.get('value') for i in body.get('inputs', []) }
+            if inputs.get('conflict-toggle'):
+                warm_conflict_caches()
+
+origin_options = metadata['origin_options']
+category_options = metadata['category_options']
+calender_options = metadata['calender_options']
 
 app.layout = html.Div(children=[
     html.H1(children='NYC Film Shoots', style={'textAlign': 'center'}),
@@ -49,6 +148,8 @@ app.layout = html.Div(children=[
     dcc.Store(id='filtered-shoots-store'),
     dcc.Store(id='zipcode-shoots-store'),
     dcc.Store(id='filter-args-store'),
+    dcc.Store(id='timeline-store'),
+    dcc.Store(id='timeline-day-store'),
 
     html.Div(
         children=[
@@ -58,9 +159,9 @@ app.layout = html.Div(children=[
                     html.Br(),
                     dcc.DatePickerRange(
                         id='date-picker',
-                        min_date_allowed=df['startdate'].min(),
-                        max_date_allowed=df['enddate'].max(),
-                        initial_visible_month=df['enddate'].max(),
+                        min_date_allowed=metadata['min_date'],
+                        max_date_allowed=metadata['max_date'],
+                        initial_visible_month=metadata['max_date'],
                         number_of_months_shown=3,
                         updatemode='bothdates'
                     )
@@ -86,12 +187,23 @@ app.layout = html.Div(children=[
                         id='subcategory-picker',
                         placeholder='Select Subcategory',
                         style={'width': '50%', 'margin': 'auto'},
+                    ),
+                    dcc.Checklist(
+                        id='conflict-toggle',
+                        options=['Show conflicting blocks'],
+                        value=[],
+                        style={'textAlign': 'center'}
                     )
                 ]
             )
         ]
     ),
 
+    html.Div(
+        html.Progress(id='filter-progress', value='0', max='3', style={'visibility': 'hidden'}),
+        style={'textAlign': 'center'}
+    ),
+
     dcc.Loading(
         type='default',
         children=html.Div(
@@ -111,11 +223,18 @@ app.layout = html.Div(children=[
                     ),
                     html.Div(
                         id='container-bar',
-                        children=html.Div(dcc.Graph(
-                            id='zipcode-bar',
-                            style={'height': '80vh', 'width': '80vh'},
-                            config={'displayModeBar': False}
-                        )),
+                        children=[
+                            html.Div(dcc.Graph(
+                                id='zipcode-bar',
+                                style={'height': '50vh', 'width': '80vh'},
+                                config={'displayModeBar': False}
+                            )),
+                            html.Div(dcc.Graph(
+                                id='activity-timeline',
+                                style={'height': '30vh', 'width': '80vh'},
+                                config={'displayModeBar': False}
+                            ))
+                        ],
                         className='six columns',
                         style={'display': 'inline-block'}
                     )
@@ -126,60 +245,98 @@ app.layout = html.Div(children=[
     )
 ])
 
-@app.callback(
+PICK_DATES_DEPENDENCIES = [
     Output('filtered-shoots-store', 'data'),
     Output('zipcode-shoots-store', 'data'),
+    Output('filter-args-store', 'data'),
     Input('date-picker', 'start_date'),
     Input('date-picker', 'end_date'),
     Input('origin-picker', 'value'),
     Input('category-picker', 'value'),
     Input('subcategory-picker', 'value')
-)
-def pick_dates(startdate: str, enddate: str, origin: str, category: str, subcat: str):
+]
+
+def pick_dates(set_progress, startdate: str, enddate: str, origin: str, category: str, subcat: str):
     if (startdate == None) or (enddate == None):
-        return (None, None)
+        return (None, None, None)
 
+    filter_args = {
+        'startdate': startdate,
+        'enddate': enddate,
+        'origin': origin,
+        'category': category,
+        'subcat': subcat
+    }
     startdate = datetime.datetime.strptime(startdate, '%Y-%m-%d').date()
     enddate = datetime.datetime.strptime(enddate, '%Y-%m-%d').date()
 
-    filtered_df = df.loc[(df['startdate'] <= enddate) & (df['enddate'] >= startdate)].copy()
-    if (origin != None) and (origin != 'ALL'):
-        filtered_df = filtered_df.loc[filtered_df['origin'] == origin]
-    if (category != None) and (category != 'ALL'):
-        filtered_df = filtered_df.loc[filtered_df['category'] == category]
-    if (subcat != None) and (subcat != 'ALL'):
-        filtered_df = filtered_df.loc[filtered_df['subcategory'] == subcat]
-
+    set_progress(('0', '3'))
+    filtered_df = filters.filter_permits(startdate, enddate, origin, category, subcat)
     if len(filtered_df) == 0:
-        return (None, None)
-
-    temp = pd.DataFrame(filtered_df['zipcode'].to_list(), index=filtered_df['id_']).stack().reset_index()
-    temp.drop(columns='level_1', inplace=True)
-    temp.columns = ['permit_id', 'zip_code']
-    temp['zip_code'] = temp['zip_code'].map(lambda x: str(x))
-    temp = temp.groupby('zip_code')['permit_id'].unique().reset_index()
-    temp['permit_count'] = temp['permit_id'].map(lambda x: len(x))
-    temp = temp[['zip_code', 'permit_count']]
-
-    counts = zip_codes.merge(temp, left_on='zipcode', right_on='zip_code', how='left')
-    counts = counts[['zipcode', 'permit_count', 'geometry']]
-    counts['permit_count'] = counts['permit_count'].fillna(0)
-    counts['permit_count'] = counts['permit_count'].astype('int')
-    counts.set_index('zipcode', inplace=True)
-    counts['zipcode'] = counts.index
-
-    filtered_df['startdate'] = pd.to_datetime(filtered_df['startdate']).dt.strftime('%Y-%m-%d')
-    filtered_df['enddate'] = pd.to_datetime(filtered_df['enddate']).dt.strftime('%Y-%m-%d')
+        return (None, None, None)
+
+    set_progress(('1', '3'))
+    counts = filters.zipcode_counts(filtered_df)
+    filtered_df = filters.format_dates(filtered_df)
+    set_progress(('2', '3'))
 
     # __geo_interface__ is GeoJSON as str
-    return json.dumps(filtered_df.__geo_interface__), json.dumps(counts.__geo_interface__)
+    return json.dumps(filtered_df.__geo_interface__), json.dumps(counts.__geo_interface__), filter_args
+
+if graphing_callbacks.BACKGROUND_CALLBACKS:
+    app.callback(
+        *PICK_DATES_DEPENDENCIES,
+        background=True,
+        interval=graphing_callbacks.BACKGROUND_INTERVAL,
+        progress=[Output('filter-progress', 'value'), Output('filter-progress', 'max')],
+        running=[
+            (Output('filter-progress', 'style'), {'visibility': 'visible'}, {'visibility': 'hidden'})
+        ]
+    )(pick_dates)
+else:
+    @app.callback(*PICK_DATES_DEPENDENCIES)
+    def pick_dates_foreground(startdate: str, enddate: str, origin: str, category: str, subcat: str):
+        return pick_dates(lambda progress: None, startdate, enddate, origin, category, subcat)
+
+@app.callback(
+    Output('timeline-store', 'data'),
+    Input('date-picker', 'start_date'),
+    Input('date-picker', 'end_date'),
+    Input('origin-picker', 'value'),
+    Input('category-picker', 'value'),
+    Input('subcategory-picker', 'value')
+)
+def pick_timeline(startdate: str, enddate: str, origin: str, category: str, subcat: str):
+    if (startdate == None) or (enddate == None):
+        return None
+
+    startdate = datetime.datetime.strptime(startdate, '%Y-%m-%d').date()
+    enddate = datetime.datetime.strptime(enddate, '%Y-%m-%d').date()
+
+    days, counts = activity.daily_activity(startdate, enddate, origin, category, subcat)
+    if len(days) == 0:
+        return None
+
+    return json.dumps({'day': days, 'active_count': counts})
+
+@app.callback(
+    Output('timeline-day-store', 'data'),
+    Input('activity-timeline', 'clickData'),
+    Input('timeline-store', 'data')
+)
+def pick_day(click_data: dict, timeline_json: str):
+    # New range/filters clear the selected day
+    if (ctx.triggered_id != 'activity-timeline') or (click_data == None):
+        return None
+
+    return click_data['points'][0]['x'][:10]
 
 @app.callback(
     Output('subcategory-picker', 'options'),
     Input('category-picker', 'value')
 )
 def update_subcategories(category: str):
-    options = df.loc[df['category'] == category]['subcategory'].unique()
+    options = metadata['subcategories'].get(category, [])
 
     return ['ALL', *options]
 
@@ -0,0 +1,26 @@
+import datetime
+import timeit
+
+import datasets
+import filters
+
+# Times distinct permit counts per zip code for a full-history selection:
+# sparse incidence matrix (zipcode_counts) vs the original groupby aggregation.
+# Run from src/app with the datasets in ./data.
+
+REPEAT = 5
+NUMBER = 10
+
+if __name__ == '__main__':
+    metadata = datasets.load_metadata()
+    startdate = datetime.datetime.strptime(metadata['min_date'], '%Y-%m-%d').date()
+    enddate = datetime.datetime.strptime(metadata['max_date'], '%Y-%m-%d').date()
+    filtered_df = filters.filter_permits(startdate, enddate, None, None, None)
+
+    build = timeit.timeit(filters.load_zipcode_incidence, number=1)
+    print(f'{len(filtered_df)} blocks, {filtered_df["id_"].nunique()} permits')
+    print(f'incidence matrix build: {build * 1000:.1f} ms (once per process)')
+
+    for name, func in [('zipcode_counts', filters.zipcode_counts), ('groupby', filters.zipcode_counts_groupby)]:
+        times = timeit.repeat(lambda: func(filtered_df), repeat=REPEAT, number=NUMBER)
+        print(f'{name}: {min(times) / NUMBER * 1000:.2f} ms per call (best of {REPEAT})')
@@ -0,0 +1,172 @@
+import datetime
+import functools
+import os
+import pickle
+import warnings
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from shapely.strtree import STRtree
+
+import datasets
+
+CONFLICTS_REPORT = './data/conflicts.csv'
+CONFLICTS_TABLE = './data/conflicts.p'
+WINDOW_DAYS = 7
+
+# Blocks are swept through fixed windows of days. Each window gets a spatial
+# index (STRtree) over only the blocks active in it, so just pairs that are
+# both concurrent and co-located are ever compared. A pair is reported once,
+# in the window where its date overlap begins.
+
+def _intersecting_pairs(geoms: np.ndarray) -> tuple:
+    """
+    Helper function to return positional pairs of intersecting geometries.
+    """
+    tree = STRtree(geoms)
+    if hasattr(tree, 'query_items'):
+        # shapely < 2 queries one envelope at a time and has no predicate
+        pairs = [
+            (i, j) for i, geom in enumerate(geoms) for j in tree.query_items(geom) if geom.intersects(geoms[j])
+        ]
+        left, right = np.array(pairs, dtype='int64').reshape(-1, 2).T
+    else:
+        left, right = tree.query(geoms, predicate='intersects')
+
+    return left, right
+
+def _window_blocks(starts: np.ndarray, ends: np.ndarray, window_days: int) -> tuple:
+    """
+    Helper function to expand blocks into (window, block) pairs sorted by window.
+    """
+    first_window = starts // window_days
+    n_windows = ends // window_days - first_window + 1
+
+    blocks = np.repeat(np.arange(len(starts)), n_windows)
+    offsets = np.arange(len(blocks)) - np.repeat(np.cumsum(n_windows) - n_windows, n_windows)
+    windows = np.repeat(first_window, n_windows) + offsets
+
+    order = np.argsort(windows, kind='stable')
+
+    return windows[order], blocks[order]
+
+def find_conflicts(df: gpd.GeoDataFrame, window_days: int = WINDOW_DAYS) -> gpd.GeoDataFrame:
+    """
+    Function to find pairs of blocks held by different permits that share curb
+    space on overlapping dates.
+    """
+    columns = ['permit_a', 'permit_b', 'block_a', 'block_b', 'overlap_start', 'overlap_end', 'geometry']
+    if len(df) == 0:
+        return gpd.GeoDataFrame(columns=columns, geometry='geometry')
+
+    geometry = df['geometry'].reset_index(drop=True)
+    shapes = geometry.to_numpy()
+    permits = df['id_'].to_numpy()
+    starts = pd.to_datetime(df['startdate']).values.astype('datetime64[D]').astype('int64')
+    ends = pd.to_datetime(df['enddate']).values.astype('datetime64[D]').astype('int64')
+    ends = np.maximum(starts, ends)
+
+    windows, blocks = _window_blocks(starts, ends, window_days)
+    bounds = np.flatnonzero(np.diff(windows)) + 1
+    lefts = []
+    rights = []
+
+    for window, window_blocks in zip(windows[np.r_[0, bounds]], np.split(blocks, bounds)):
+        left, right = _intersecting_pairs(shapes[window_blocks])
+        a = window_blocks[left]
+        b = window_blocks[right]
+
+        overlap_start = np.maximum(starts[a], starts[b])
+        overlap_end = np.minimum(ends[a], ends[b])
+        keep = (
+            (a < b)
+            & (permits[a] != permits[b])
+            & (overlap_start <= overlap_end)
+            & (overlap_start // window_days == window)
+        )
+        lefts.append(a[keep])
+        rights.append(b[keep])
+
+    a = np.concatenate(lefts)
+    b = np.concatenate(rights)
+
+    # Blocks touching at a corner intersect without sharing any curb. Only
+    # whether the length is non-zero matters, so geographic CRS units are fine.
+    shared = gpd.GeoSeries(geometry.iloc[a].values).intersection(gpd.GeoSeries(geometry.iloc[b].values))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        held = (shared.length > 0).to_numpy()
+    a = a[held]
+    b = b[held]
+
+    conflicts = gpd.GeoDataFrame({
+        'permit_a': permits[a],
+        'permit_b': permits[b],
+        'block_a': df.index.to_numpy()[a],
+        'block_b': df.index.to_numpy()[b],
+        'overlap_start': np.maximum(starts[a], starts[b]).astype('datetime64[D]'),
+        'overlap_end': np.minimum(ends[a], ends[b]).astype('datetime64[D]'),
+        'geometry': shared.values[held]
+    }, geometry='geometry', crs=df.crs)
+    conflicts['overlap_start'] = conflicts['overlap_start'].dt.date
+    conflicts['overlap_end'] = conflicts['overlap_end'].dt.date
+
+    return conflicts.sort_values(['overlap_start', 'permit_a', 'permit_b']).reset_index(drop=True)
+
+@functools.lru_cache(maxsize=None)
+def load_conflicts() -> gpd.GeoDataFrame:
+    """
+    Function to load the full-history conflict table written by the batch
+    report, checking it was computed from the current dataset files.
+    """
+    if not os.path.exists(CONFLICTS_TABLE):
+        raise FileNotFoundError(f'{CONFLICTS_TABLE} not found, run python conflicts.py to generate it')
+
+    with open(CONFLICTS_TABLE, 'rb') as f:
+        table = pickle.load(f)
+    if table['dataset_version'] != datasets.dataset_version():
+        raise ValueError(f'{CONFLICTS_TABLE} is out of date with {datasets.FILM_PERMITS}, rerun python conflicts.py')
+
+    return gpd.GeoDataFrame(table['conflicts'])
+
+@functools.lru_cache(maxsize=64)
+def filtered_conflicts(
+    startdate: datetime.date,
+    enddate: datetime.date,
+    origin: str,
+    category: str,
+    subcat: str) -> gpd.GeoDataFrame:
+    """
+    Function to select conflicts overlapping a date range (inclusive) where
+    both permits match the origin/category/subcategory filters.
+    """
+    conflicts = load_conflicts()
+    df = datasets.load_film_df()
+    permits = df.drop_duplicates('id_').set_index('id_')
+
+    matches = pd.Series(True, index=permits.index)
+    if (origin != None) and (origin != 'ALL'):
+        matches &= permits['origin'] == origin
+    if (category != None) and (category != 'ALL'):
+        matches &= permits['category'] == category
+    if (subcat != None) and (subcat != 'ALL'):
+        matches &= permits['subcategory'] == subcat
+
+    selected = (
+        (conflicts['overlap_start'] <= enddate)
+        & (conflicts['overlap_end'] >= startdate)
+        & conflicts['permit_a'].map(matches).fillna(False).astype(bool)
+        & conflicts['permit_b'].map(matches).fillna(False).astype(bool)
+    )
+
+    return conflicts.loc[selected]
+
+if __name__ == '__main__':
+    # Batch report over the full permit history, the pickled table (tagged
+    # with the dataset version) is what the app overlay filters
+    conflicts = find_conflicts(datasets.load_film_df())
+    conflicts.to_csv(CONFLICTS_REPORT, index=False)
+    with open(CONFLICTS_TABLE, 'wb') as f:
+        pickle.dump({'dataset_version': datasets.dataset_version(), 'conflicts': conflicts}, f)
+    print(f'{len(conflicts)} conflicting block pairs written to {CONFLICTS_REPORT} and {CONFLICTS_TABLE}')
@@ -0,0 +1,86 @@
+import functools
+import hashlib
+import json
+import os
+import pickle
+
+FILM_PERMITS = './data/film_df.p'
+ZIP_CODES = './data/zip_codes.p'
+METADATA = './data/metadata.json'
+
+# Heavy imports (geopandas, pandas) are deferred to the first data access so
+# that workers boot from the metadata sidecar alone.
+
+@functools.lru_cache(maxsize=None)
+def load_metadata() -> dict:
+    """
+    Function to load the precomputed layout metadata (options, date bounds,
+    category to subcategory map) written by permit_functions.create_metadata.
+    """
+    if not os.path.exists(METADATA):
+        raise FileNotFoundError(
+            f'{METADATA} not found, run the App Metadata cell of '
+            'data_processing/cleaning_data.ipynb to generate it'
+        )
+
+    with open(METADATA, 'r') as f:
+        return json.load(f)
+
+@functools.lru_cache(maxsize=None)
+def load_film_df():
+    """
+    Function to load and prepare the film permit blocks on first use.
+    """
+    import geopandas as gpd
+    import pandas as pd
+
+    with open(FILM_PERMITS, 'rb') as f:
+        df = gpd.GeoDataFrame(pickle.load(f))
+
+    df['startdate'] = pd.to_datetime(df['startdate']).dt.date
+    df['enddate'] = pd.to_datetime(df['enddate']).dt.date
+    df['enteredon'] = pd.to_datetime(df['enteredon']).dt.date
+    df['main_st'] = df['main_st'].str.upper()
+    df['cross_st_1'] = df['cross_st_1'].str.upper()
+    df['cross_st_2'] = df['cross_st_2'].str.upper()
+    df.rename(columns={'id': 'id_'}, inplace=True)
+    df = gpd.GeoDataFrame(df[[
+        'id_', 'zipcode', 'startdate', 'enddate', 'category', 'subcategory', 'origin', 'main_st', 'cross_st_1', 'cross_st_2', 'geometry'
+    ]])
+    # Sorted block ids are the API's pagination key
+    df.sort_index(inplace=True)
+
+    return df
+
+@functools.lru_cache(maxsize=None)
+def load_zip_codes():
+    """
+    Function to load the zip code boundaries on first use.
+    """
+    import geopandas as gpd
+
+    with open(ZIP_CODES, 'rb') as f:
+        zip_codes = gpd.GeoDataFrame(pickle.load(f))
+
+    return zip_codes
+
+@functools.lru_cache(maxsize=None)
+def dataset_version() -> str:
+    """
+    Function to fingerprint the dataset files (size, modified time) without
+    loading them, i.e. for ETags.
+    """
+    stats = []
+    for path in (FILM_PERMITS, ZIP_CODES):
+        stat = os.stat(path)
+        stats.append((path, stat.st_size, stat.st_mtime_ns))
+
+    return hashlib.sha1(repr(stats).encode()).hexdigest()[:16]
+
+def preload():
+    """
+    Function to load every dataset up front (i.e. in the gunicorn master
+    with preload_app so forked workers share the loaded frames).
+    """
+    load_film_df()
+    load_zip_codes()
@@ -0,0 +1,167 @@
+import datetime
+import functools
+
+import numpy as np
+
+import datasets
+
+# Shared by the Dash callbacks and the REST API so both filter identically.
+
+PAGE_SCAN_ROWS = 50000
+
+def _apply_filters(
+    df,
+    startdate: datetime.date,
+    enddate: datetime.date,
+    origin: str,
+    category: str,
+    subcat: str,
+    bbox: tuple | None):
+    """
+    Helper function to filter a frame of permit blocks.
+    """
+    filtered_df = df.loc[(df['startdate'] <= enddate) & (df['enddate'] >= startdate)].copy()
+    if (origin != None) and (origin != 'ALL'):
+        filtered_df = filtered_df.loc[filtered_df['origin'] == origin]
+    if (category != None) and (category != 'ALL'):
+        filtered_df = filtered_df.loc[filtered_df['category'] == category]
+    if (subcat != None) and (subcat != 'ALL'):
+        filtered_df = filtered_df.loc[filtered_df['subcategory'] == subcat]
+    if bbox != None:
+        minx, miny, maxx, maxy = bbox
+        filtered_df = filtered_df.cx[minx:maxx, miny:maxy]
+
+    return filtered_df
+
+def filter_permits(
+    startdate: datetime.date,
+    enddate: datetime.date,
+    origin: str,
+    category: str,
+    subcat: str,
+    bbox: tuple | None = None):
+    """
+    Function to return permit blocks active between two dates (inclusive)
+    matching the origin/category/subcategory filters and bounding box.
+    """
+    return _apply_filters(datasets.load_film_df(), startdate, enddate, origin, category, subcat, bbox)
+
+def filter_permits_page(
+    startdate: datetime.date,
+    enddate: datetime.date,
+    origin: str,
+    category: str,
+    subcat: str,
+    bbox: tuple | None,
+    after: int | None,
+    limit: int) -> tuple:
+    """
+    Function to return up to limit filtered permit blocks with a block id
+    (index) greater than after, and the last block id when more remain.
+    """
+    import pandas as pd
+
+    df = datasets.load_film_df()
+
+    # Blocks are sorted by id, so a page scans forward from the cursor only
+    start = 0 if after == None else int(df.index.searchsorted(after, side='right'))
+    chunks = []
+    found = 0
+    while (start < len(df)) and (found <= limit):
+        chunk = _apply_filters(df.iloc[start:start + PAGE_SCAN_ROWS], startdate, enddate, origin, category, subcat, bbox)
+        chunks.append(chunk)
+        found += len(chunk)
+        start += PAGE_SCAN_ROWS
+
+    page = pd.concat(chunks) if len(chunks) > 0 else df.iloc[:0]
+    next_after = page.index[limit - 1] if len(page) > limit else None
+
+    return page.iloc[:limit], next_after
+
+@functools.lru_cache(maxsize=None)
+def load_zipcode_incidence() -> tuple:
+    """
+    Function to build the permits x zip codes incidence matrix (boolean CSR,
+    one entry per distinct permit/zip code pair) and its permit index.
+    """
+    import pandas as pd
+    from scipy import sparse
+
+    df = datasets.load_film_df()
+    zip_codes = datasets.load_zip_codes()
+
+    permits = pd.Index(df['id_'].unique())
+    zips = pd.Index(zip_codes['zipcode'].astype(str))
+
+    # A permit repeats its zip codes on every held block, dedupe pairs once here
+    pairs = pd.Series(df['zipcode'].to_numpy(), index=permits.get_indexer(df['id_'])).explode().dropna()
+    rows = pairs.index.to_numpy()
+    cols = zips.get_indexer(pairs.astype(str).to_numpy())
+    keys = np.unique(rows[cols >= 0].astype('int64') * len(zips) + cols[cols >= 0])
+
+    incidence = sparse.csr_matrix(
+        (np.ones(len(keys), dtype=bool), (keys // len(zips), keys % len(zips))),
+        shape=(len(permits), len(zips))
+    )
+
+    return incidence, permits
+
+def zipcode_counts(filtered_df):
+    """
+    Function to count distinct permits per zip code for filtered permit blocks.
+    """
+    incidence, permits = load_zipcode_incidence()
+    zip_codes = datasets.load_zip_codes()
+
+    selected = np.zeros(len(permits), dtype=np.int32)
+    selected[permits.get_indexer(filtered_df['id_'].unique())] = 1
+
+    counts = zip_codes[['zipcode', 'geometry']].copy()
+    counts['permit_count'] = incidence.T @ selected
+    counts = counts[['zipcode', 'permit_count', 'geometry']]
+    counts.set_index('zipcode', inplace=True)
+    counts['zipcode'] = counts.index
+
+    return counts
+
+def zipcode_counts_groupby(filtered_df):
+    """
+    Function to count distinct permits per zip code with the original
+    groupby/unique aggregation (reference for zipcode_counts in tests and
+    bench_zipcode_counts.py).
+    """
+    import pandas as pd
+
+    zip_codes = datasets.load_zip_codes()
+
+    if len(filtered_df) == 0:
+        temp = pd.DataFrame(columns=['zip_code', 'permit_count'])
+    else:
+        temp = pd.DataFrame(filtered_df['zipcode'].to_list(), index=filtered_df['id_']).stack().reset_index()
+        temp.drop(columns='level_1', inplace=True)
+        temp.columns = ['permit_id', 'zip_code']
+        temp['zip_code'] = temp['zip_code'].map(lambda x: str(x))
+        temp = temp.groupby('zip_code')['permit_id'].unique().reset_index()
+        temp['permit_count'] = temp['permit_id'].map(lambda x: len(x))
+        temp = temp[['zip_code', 'permit_count']]
+
+    counts = zip_codes.merge(temp, left_on='zipcode', right_on='zip_code', how='left')
+    counts = counts[['zipcode', 'permit_count', 'geometry']]
+    counts['permit_count'] = counts['permit_count'].fillna(0)
+    counts['permit_count'] = counts['permit_count'].astype('int')
+    counts.set_index('zipcode', inplace=True)
+    counts['zipcode'] = counts.index
+
+    return counts
+
+def format_dates(filtered_df):
+    """
+    Function to convert permit block dates to YYYY-MM-DD strings for JSON.
+    """
+    import pandas as pd
+
+    filtered_df = filtered_df.copy()
+    filtered_df['startdate'] = pd.to_datetime(filtered_df['startdate']).dt.strftime('%Y-%m-%d')
+    filtered_df['enddate'] = pd.to_datetime(filtered_df['enddate']).dt.strftime('%Y-%m-%d')
+
+    return filtered_df
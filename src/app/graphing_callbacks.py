@@ -1,63 +1,124 @@
-from dash import Input, Output
+from dash import Input, Output, State
 from dash import callback
 
 import plotly.express as px
 import plotly.graph_objects as go
 
-import geopandas as gpd
-import pandas as pd
-import shapely.geometry
-import numpy as np
+import functools
 import json
+import os
 
+# geopandas, pandas, shapely and numpy are imported inside the callbacks so
+# that importing this module (and booting a worker) stays cheap.
+
+# Heavy callbacks run in the request worker, BACKGROUND_CALLBACKS=1 runs them
+# as background jobs instead (compare the two with load_test.py). Background
+# jobs are polled every BACKGROUND_INTERVAL ms.
+BACKGROUND_CALLBACKS = os.environ.get('BACKGROUND_CALLBACKS', '0') == '1'
+BACKGROUND_INTERVAL = 200
 
 NYC_LAT_LONG = {'lon': -74.0060, 'lat': 40.7128}
 
-default_map_fig = go.Figure(go.Scattermapbox(
-    lat=[None],
-    lon=[None]
-))
-default_map_fig.update_layout(
-    mapbox={
-        'style': 'carto-positron',
-        'center': NYC_LAT_LONG,
-        'zoom': 10
-    },
-    title={
-        'text': 'Map of Blocks with Film Shoots',
-        'y':0.9,
-        'x':0.5,
-        'xanchor': 'center',
-        'yanchor': 'top'
-    }
-)
+@functools.lru_cache(maxsize=None)
+def default_map_fig() -> go.Figure:
+    """
+    Function to build the empty map figure on first use.
+    """
+    fig = go.Figure(go.Scattermapbox(
+        lat=[None],
+        lon=[None]
+    ))
+    fig.update_layout(
+        mapbox={
+            'style': 'carto-positron',
+            'center': NYC_LAT_LONG,
+            'zoom': 10
+        },
+        title={
+            'text': 'Map of Blocks with Film Shoots',
+            'y':0.9,
+            'x':0.5,
+            'xanchor': 'center',
+            'yanchor': 'top'
+        }
+    )
 
-default_bar_fig = go.Figure(px.bar())
-default_bar_fig.update_layout(
-    title={
-        'text': 'Top Zip Codes',
-        'y':0.9,
-        'x':0.5,
-        'xanchor': 'center',
-        'yanchor': 'top'
-    },
-    margin={
-        't': 100
-    },
-    yaxis_title='Permit Counts',
-    xaxis_title='Zip Code'
-)
-default_bar_fig.update_yaxes(showticklabels=False)
-default_bar_fig.update_xaxes(showticklabels=False)
+    return fig
+
+@functools.lru_cache(maxsize=None)
+def default_bar_fig() -> go.Figure:
+    """
+    Function to build the empty zip code bar figure on first use.
+    """
+    fig = go.Figure(px.bar())
+    fig.update_layout(
+        title={
+            'text': 'Top Zip Codes',
+            'y':0.9,
+            'x':0.5,
+            'xanchor': 'center',
+            'yanchor': 'top'
+        },
+        margin={
+            't': 100
+        },
+        yaxis_title='Permit Counts',
+        xaxis_title='Zip Code'
+    )
+    fig.update_yaxes(showticklabels=False)
+    fig.update_xaxes(showticklabels=False)
+
+    return fig
+
+@functools.lru_cache(maxsize=None)
+def default_timeline_fig() -> go.Figure:
+    """
+    Function to build the empty activity timeline figure on first use.
+    """
+    fig = go.Figure(px.line())
+    fig.update_layout(
+        title={
+            'text': 'Active Permits per Day',
+            'y':0.9,
+            'x':0.5,
+            'xanchor': 'center',
+            'yanchor': 'top'
+        },
+        yaxis_title='Active Permits',
+        xaxis_title='Date'
+    )
+    fig.update_yaxes(showticklabels=False)
+    fig.update_xaxes(showticklabels=False)
+
+    return fig
 
 @callback(
     Output('film-map', 'figure'),
     Input('filtered-shoots-store', 'data'),
-    Input('zipcode-shoots-store', 'data')
+    Input('zipcode-shoots-store', 'data'),
+    Input('timeline-day-store', 'data'),
+    Input('conflict-toggle', 'value'),
+    State('filter-args-store', 'data'),
+    **({
+        'background': True,
+        'interval': BACKGROUND_INTERVAL,
+        'cancel': [
+            Input('date-picker', 'start_date'),
+            Input('date-picker', 'end_date'),
+            Input('origin-picker', 'value'),
+            Input('category-picker', 'value'),
+            Input('subcategory-picker', 'value')
+        ]
+    } if BACKGROUND_CALLBACKS else {})
 )
-def fig_by_date(filtered_json, zipcode_json):
+def fig_by_date(filtered_json, zipcode_json, day, conflict_toggle, filter_args):
     if filtered_json == None:
-        return default_map_fig
+        return default_map_fig()
+
+    import geopandas as gpd
+    import pandas as pd
+    import shapely.geometry
+    import numpy as np
 
     j = json.loads(filtered_json)
     filtered_df = gpd.GeoDataFrame.from_features(j)
@@ -65,6 +126,16 @@ def fig_by_date(filtered_json, zipcode_json):
     filtered_df['startdate'] = pd.to_datetime(filtered_df['startdate']).dt.date
     filtered_df['enddate'] = pd.to_datetime(filtered_df['enddate']).dt.date
 
+    # Day selected on the timeline narrows the already filtered blocks
+    title = 'Map of Blocks with Film Shoots'
+    if day != None:
+        selected = pd.to_datetime(day).date()
+        filtered_df = filtered_df.loc[(filtered_df['startdate'] <= selected) & (filtered_df['enddate'] >= selected)]
+        # Zip code shading still counts permits over the whole selected range
+        title = f'Map of Blocks with Film Shoots on {day}'
+        if filter_args != None:
+            title += f'<br><sup>Zip code shading: {filter_args["startdate"]} to {filter_args["enddate"]}</sup>'
+
     c = json.loads(zipcode_json)
     counts = gpd.GeoDataFrame.from_features(c)
 
@@ -150,7 +221,7 @@ def fig_by_date(filtered_json, zipcode_json):
         locations=counts.index,
         color='permit_count',
         custom_data=['zipcode', 'permit_count'],
-        title='Map of Blocks with Film Shoots',
+        title=title,
         opacity=0.1,
         mapbox_style='carto-positron',
         center=NYC_LAT_LONG,
@@ -160,6 +231,8 @@ def fig_by_date(filtered_json, zipcode_json):
         hovertemplate='<b>Zip Code:</b> %{customdata[0]}<br><b>Permit Count:</b> %{customdata[1]}'
     )
     fig.add_trace(scatter)
+    if conflict_toggle and (filter_args != None):
+        fig.add_trace(conflict_trace(filter_args, day))
     fig.update_layout(
         coloraxis_showscale=False,
         title={
@@ -172,13 +245,73 @@ def fig_by_date(filtered_json, zipcode_json):
 
     return fig
 
+def conflict_trace(filter_args: dict, day: str | None) -> go.Scattermapbox:
+    """
+    Function to build a map trace of curb space held by more than one permit
+    at once, for the filters of the mapped blocks (and timeline day).
+    """
+    import datetime
+    import shapely.geometry
+
+    import conflicts
+
+    startdate = datetime.datetime.strptime(filter_args['startdate'], '%Y-%m-%d').date()
+    enddate = datetime.datetime.strptime(filter_args['enddate'], '%Y-%m-%d').date()
+    if day != None:
+        startdate = enddate = datetime.datetime.strptime(day, '%Y-%m-%d').date()
+
+    found = conflicts.filtered_conflicts(
+        startdate, enddate, filter_args['origin'], filter_args['category'], filter_args['subcat']
+    )
+
+    lats = []
+    lons = []
+    customdata = []
+
+    data = zip(
+        found['geometry'],
+        found['permit_a'],
+        found['permit_b'],
+        found['overlap_start'],
+        found['overlap_end']
+    )
+
+    for feature, permit_a, permit_b, sdate, edate in data:
+        if isinstance(feature, shapely.geometry.linestring.LineString):
+            linestrings = [feature]
+        elif isinstance(feature, shapely.geometry.base.BaseMultipartGeometry):
+            linestrings = [ g for g in feature.geoms if isinstance(g, shapely.geometry.linestring.LineString) ]
+        else:
+            continue
+        for linestring in linestrings:
+            x, y = linestring.xy
+            lats.extend([*y, None])
+            lons.extend([*x, None])
+            customdata.extend([(permit_a, permit_b, sdate, edate)] * len(y) + [(None, None, None, None)])
+
+    return go.Scattermapbox(
+        mode='lines',
+        lat=lats,
+        lon=lons,
+        line={'color': 'red', 'width': 4},
+        customdata=customdata,
+        hovertemplate='<br>'.join([
+            '<b>Conflicting Permits:</b> %{customdata[0]}, %{customdata[1]}',
+            '<b>Overlap Start:</b> %{customdata[2]}',
+            '<b>Overlap End:</b> %{customdata[3]}'
+        ]),
+        name='Conflicts'
+    )
+
 @callback(
     Output('zipcode-bar', 'figure'),
     Input('zipcode-shoots-store', 'data')
 )
 def top_ten_zc(zipcode_json):
     if zipcode_json == None:
-        return default_bar_fig
+        return default_bar_fig()
+
+    import geopandas as gpd
 
     c = json.loads(zipcode_json)
     counts = gpd.GeoDataFrame.from_features(c)
@@ -212,4 +345,40 @@ def top_ten_zc(zipcode_json):
         hovertemplate='<b>Zip Code:</b> %{x}<br><b>Permit Count:</b> %{y}'
     )
 
-    return fig
\ No newline at end of file
+    return fig
+
+@callback(
+    Output('activity-timeline', 'figure'),
+    Input('timeline-store', 'data')
+)
+def activity_timeline(timeline_json):
+    if timeline_json == None:
+        return default_timeline_fig()
+
+    timeline = json.loads(timeline_json)
+
+    fig = go.Figure(
+        px.line(
+            timeline,
+            x='day',
+            y='active_count',
+            labels={'active_count': 'Active Permits', 'day': 'Date'}
+        )
+    )
+    fig.update_layout(
+        title={
+            'text': 'Active Permits per Day (click a day to map it)',
+            'y':0.9,
+            'x':0.5,
+            'xanchor': 'center',
+            'yanchor': 'top'
+        },
+        yaxis_title='Active Permits',
+        xaxis_title='Date',
+        hovermode='x'
+    )
+    fig.update_traces(
+        hovertemplate='<b>Date:</b> %{x}<br><b>Active Permits:</b> %{y}'
+    )
+
+    return fig
@@ -0,0 +1,6 @@
+import os
+
+# Workers boot from the metadata sidecar and load the datasets on first
+# request. With PRELOAD_DATA=1 the master loads the datasets once instead and
+# forked workers share them.
+preload_app = os.environ.get('PRELOAD_DATA') == '1'
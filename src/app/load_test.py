@@ -0,0 +1,250 @@
+import argparse
+import concurrent.futures
+import datetime
+import json
+import math
+import random
+import threading
+import time
+import urllib.request
+
+# Load test for the date range filter against a running server (gunicorn or
+# app.run_server). Each simulated user "drags" the date picker: several date
+# range changes in quick succession, each superseding the last, then waits for
+# the final result. Meanwhile other users make cheap interactions (subcategory
+# options). Run once with BACKGROUND_CALLBACKS=0 (default) and once with
+# BACKGROUND_CALLBACKS=1 on the server and compare the p95 latencies:
+#
+#   $ gunicorn --workers 2 app:server
+#   $ python load_test.py --url http://127.0.0.1:8000 --users 8 --rounds 5
+
+UPDATE_PATH = '/_dash-update-component'
+FILTER_OUTPUT = 'filtered-shoots-store.data'
+
+def _post(url: str, body: dict) -> dict:
+    """
+    Helper function to POST a callback request and return its JSON response.
+    """
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(body).encode(),
+        headers={'Content-Type': 'application/json'}
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+def _get(url: str) -> dict:
+    """
+    Helper function to GET a JSON document.
+    """
+    with urllib.request.urlopen(url) as response:
+        return json.loads(response.read())
+
+def _find_component(layout, component_id: str) -> dict | None:
+    """
+    Helper function to find a component's props in the serialized layout.
+    """
+    if isinstance(layout, dict):
+        props = layout.get('props', {})
+        if props.get('id') == component_id:
+            return props
+        children = props.get('children')
+        return _find_component(children, component_id) if children != None else None
+    if isinstance(layout, list):
+        for child in layout:
+            found = _find_component(child, component_id)
+            if found != None:
+                return found
+
+    return None
+
+def _filter_body(dependency: dict, startdate: str, enddate: str) -> dict:
+    """
+    Helper function to build the pick_dates callback request for a date range.
+    """
+    outputs = [
+        {'id': output.split('.')[0], 'property': output.split('.')[1]}
+        for output in dependency['output'].strip('.').split('...')
+    ]
+    values = {
+        'start_date': startdate,
+        'end_date': enddate
+    }
+
+    return {
+        'output': dependency['output'],
+        'outputs': outputs,
+        'inputs': [
+            {'id': i['id'], 'property': i['property'], 'value': values.get(i['property'])}
+            for i in dependency['inputs']
+        ],
+        'changedPropIds': ['date-picker.end_date'],
+        'state': []
+    }
+
+def _cheap_body(category: str) -> dict:
+    """
+    Helper function to build the update_subcategories callback request.
+    """
+    return {
+        'output': 'subcategory-picker.options',
+        'outputs': {'id': 'subcategory-picker', 'property': 'options'},
+        'inputs': [{'id': 'category-picker', 'property': 'value', 'value': category}],
+        'changedPropIds': ['category-picker.value'],
+        'state': []
+    }
+
+def percentile(values: list, p: float) -> float:
+    """
+    Function to return the p-th percentile (nearest rank) of a list of values.
+    """
+    ordered = sorted(values)
+    rank = max(math.ceil(p / 100 * len(ordered)) - 1, 0)
+
+    return ordered[rank]
+
+class LoadTest:
+    """
+    Class to run concurrent date picker drags and cheap interactions.
+    """
+    def __init__(self, url: str, drag: int, drag_interval: float, poll_interval: float | None):
+        self.url = url.rstrip('/')
+        self.drag = drag
+        self.drag_interval = drag_interval
+
+        dependencies = _get(self.url + '/_dash-dependencies')
+        self.dependency = [ d for d in dependencies if FILTER_OUTPUT in d['output'] ][0]
+        self.background = self.dependency.get('background') != None
+        if poll_interval == None and self.background:
+            poll_interval = self.dependency['background'].get('interval', 1000) / 1000
+        self.poll_interval = poll_interval
+
+        layout = _get(self.url + '/_dash-layout')
+        date_picker = _find_component(layout, 'date-picker')
+        self.min_date = datetime.date.fromisoformat(date_picker['min_date_allowed'])
+        self.max_date = datetime.date.fromisoformat(date_picker['max_date_allowed'])
+        category_picker = _find_component(layout, 'category-picker')
+        self.categories = category_picker['options']
+
+        self.lock = threading.Lock()
+        self.filter_latencies = []
+        self.cheap_latencies = []
+        self.running = True
+
+    def _random_range(self) -> tuple:
+        """
+        Method to pick a random date range (up to the full history).
+        """
+        span = (self.max_date - self.min_date).days
+        start = self.min_date + datetime.timedelta(days=random.randint(0, span))
+        end = start + datetime.timedelta(days=random.randint(0, (self.max_date - start).days))
+
+        return start.isoformat(), end.isoformat()
+
+    def _start(self, body: dict, old_job: str | None) -> dict:
+        """
+        Method to trigger pick_dates, superseding old_job when background.
+        """
+        url = self.url + UPDATE_PATH
+        if old_job != None:
+            url += '?oldJob=' + old_job
+
+        return _post(url, body)
+
+    def _wait(self, body: dict, started: dict) -> None:
+        """
+        Method to poll a background job until it returns its result.
+        """
+        url = f'{self.url}{UPDATE_PATH}?cacheKey={started["cacheKey"]}&job={started["job"]}'
+        while True:
+            time.sleep(self.poll_interval)
+            if 'response' in _post(url, body):
+                return
+
+    def drag_round(self) -> None:
+        """
+        Method to simulate one drag of the date picker and time its final result.
+        """
+        bodies = [ _filter_body(self.dependency, *self._random_range()) for _ in range(self.drag) ]
+        superseded = []
+        old_job = None
+
+        for body in bodies[:-1]:
+            if self.background:
+                old_job = self._start(body, old_job)['job']
+            else:
+                # The browser cannot cancel a request the worker is already running
+                thread = threading.Thread(target=self._start, args=(body, None))
+                thread.start()
+                superseded.append(thread)
+            time.sleep(self.drag_interval)
+
+        began = time.perf_counter()
+        started = self._start(bodies[-1], old_job)
+        if self.background:
+            self._wait(bodies[-1], started)
+        elapsed = time.perf_counter() - began
+
+        for thread in superseded:
+            thread.join()
+        with self.lock:
+            self.filter_latencies.append(elapsed)
+
+    def cheap_loop(self) -> None:
+        """
+        Method to make cheap interactions until the drags finish.
+        """
+        while self.running:
+            began = time.perf_counter()
+            _post(self.url + UPDATE_PATH, _cheap_body(random.choice(self.categories)))
+            elapsed = time.perf_counter() - began
+            with self.lock:
+                self.cheap_latencies.append(elapsed)
+            time.sleep(0.1)
+
+    def run(self, users: int, cheap_users: int, rounds: int) -> None:
+        """
+        Method to run the drags and cheap interactions concurrently.
+        """
+        cheap_threads = [ threading.Thread(target=self.cheap_loop) for _ in range(cheap_users) ]
+        for thread in cheap_threads:
+            thread.start()
+
+        with concurrent.futures.ThreadPoolExecutor(users) as executor:
+            futures = [ executor.submit(self.drag_round) for _ in range(users * rounds) ]
+            for future in futures:
+                future.result()
+
+        self.running = False
+        for thread in cheap_threads:
+            thread.join()
+
+    def report(self) -> None:
+        """
+        Method to print p50/p95 latencies per interaction type.
+        """
+        mode = 'background' if self.background else 'foreground'
+        print(f'callbacks: {mode}')
+        for name, latencies in [('date range', self.filter_latencies), ('cheap', self.cheap_latencies)]:
+            if len(latencies) == 0:
+                continue
+            print(
+                f'{name}: n={len(latencies)} '
+                f'p50={percentile(latencies, 50) * 1000:.0f} ms '
+                f'p95={percentile(latencies, 95) * 1000:.0f} ms'
+            )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Concurrent load test of the date range filter.')
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--users', type=int, default=8, help='concurrent users dragging the date picker')
+    parser.add_argument('--cheap-users', type=int, default=4, help='concurrent users making cheap interactions')
+    parser.add_argument('--rounds', type=int, default=5, help='drags per user')
+    parser.add_argument('--drag', type=int, default=3, help='date range changes per drag')
+    parser.add_argument('--drag-interval', type=float, default=0.2, help='seconds between changes in a drag')
+    parser.add_argument('--poll-interval', type=float, default=None, help='seconds between job polls (default: callback interval)')
+    args = parser.parse_args()
+
+    load_test = LoadTest(args.url, args.drag, args.drag_interval, args.poll_interval)
+    load_test.run(args.users, args.cheap_users, args.rounds)
+    load_test.report()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# App modules import each other by name from src/app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,100 @@
+import datetime
+import itertools
+import random
+
+import geopandas as gpd
+import pytest
+from shapely.geometry import LineString
+
+import conflicts
+
+
+def _blocks(n_blocks: int, seed: int) -> gpd.GeoDataFrame:
+    """
+    Random blocks on a small street grid: horizontal blocks on the same street
+    share curb, crossing or end-to-end blocks only touch at a point. Dates span
+    up to several windows and some permits hold more than one block.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_blocks):
+        street = rng.randint(0, 3)
+        start = rng.randint(0, 6)
+        length = rng.randint(1, 3)
+        if rng.random() < 0.7:
+            geometry = LineString([(start, street), (start + length, street)])
+        else:
+            geometry = LineString([(street, start), (street, start + length)])
+        startdate = datetime.date(2021, 1, 1) + datetime.timedelta(days=rng.randint(0, 60))
+        rows.append({
+            'id_': str(rng.randint(0, n_blocks // 2)),
+            'startdate': startdate,
+            'enddate': startdate + datetime.timedelta(days=rng.randint(0, 20)),
+            'geometry': geometry
+        })
+
+    # Block ids that are not positions
+    return gpd.GeoDataFrame(rows, index=[ 100 + 3 * i for i in range(n_blocks) ])
+
+
+def _brute_force(df: gpd.GeoDataFrame) -> set:
+    """
+    Every pair of blocks compared directly.
+    """
+    found = set()
+    for (block_a, a), (block_b, b) in itertools.combinations(df.iterrows(), 2):
+        overlap_start = max(a['startdate'], b['startdate'])
+        overlap_end = min(a['enddate'], b['enddate'])
+        if (a['id_'] == b['id_']) or (overlap_start > overlap_end):
+            continue
+        if a['geometry'].intersection(b['geometry']).length > 0:
+            found.add((block_a, block_b, overlap_start, overlap_end))
+
+    return found
+
+
+def _found(df: gpd.GeoDataFrame, window_days: int) -> list:
+    result = conflicts.find_conflicts(df, window_days)
+
+    return [
+        (row['block_a'], row['block_b'], row['overlap_start'], row['overlap_end'])
+        for _, row in result.iterrows()
+    ]
+
+
+@pytest.mark.parametrize('window_days', [1, 7, 30])
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_find_conflicts_matches_brute_force(window_days, seed):
+    df = _blocks(80, seed)
+    found = _found(df, window_days)
+
+    # Each pair once, across windows
+    assert len(found) == len(set(found))
+    assert set(found) == _brute_force(df)
+
+
+def test_find_conflicts_skips_same_permit_and_corner_touches():
+    date = datetime.date(2021, 1, 1)
+    df = gpd.GeoDataFrame({
+        'id_': ['1', '1', '2', '3'],
+        'startdate': [date] * 4,
+        'enddate': [date] * 4,
+        'geometry': [
+            LineString([(0, 0), (2, 0)]),
+            # Same permit, shared curb
+            LineString([(1, 0), (3, 0)]),
+            # Corner touch with the first block
+            LineString([(0, 0), (0, 2)]),
+            # Shares curb with both blocks of permit 1
+            LineString([(1.5, 0), (2.5, 0)])
+        ]
+    })
+    found = _found(df, 7)
+
+    assert [ (a, b) for a, b, _, _ in found ] == [(0, 3), (1, 3)]
+
+
+def test_find_conflicts_empty():
+    df = gpd.GeoDataFrame({'id_': [], 'startdate': [], 'enddate': [], 'geometry': []}, geometry='geometry')
+
+    assert len(conflicts.find_conflicts(df)) == 0
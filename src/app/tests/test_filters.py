@@ -0,0 +1,87 @@
+import datetime
+
+import geopandas as gpd
+import numpy as np
+import pytest
+from shapely.geometry import LineString, box
+
+import datasets
+import filters
+
+
+@pytest.fixture
+def permit_data(monkeypatch):
+    """
+    Small permit blocks/zip codes where permits hold several blocks and span
+    several zip codes (including one without a boundary).
+    """
+    zip_codes = gpd.GeoDataFrame({
+        'zipcode': ['10001', '10002', '10003', '11201'],
+        'borough': ['Manhattan', 'Manhattan', 'Manhattan', 'Brooklyn'],
+        'geometry': [ box(i, 0, i + 1, 1) for i in range(4) ]
+    })
+    permits = [
+        # id, zip codes, start, end, category, blocks
+        ('1', ['10001', '10002'], datetime.date(2021, 1, 1), datetime.date(2021, 1, 3), 'Film', 3),
+        ('2', ['10002'], datetime.date(2021, 1, 2), datetime.date(2021, 1, 2), 'Television', 1),
+        ('3', ['10002', '10003', '99999'], datetime.date(2021, 2, 1), datetime.date(2021, 2, 5), 'Film', 2),
+        ('4', ['11201', '10001'], datetime.date(2021, 3, 1), datetime.date(2021, 3, 1), 'Commercial', 4),
+        ('5', ['10003', '10003'], datetime.date(2021, 1, 2), datetime.date(2021, 2, 2), 'Television', 1)
+    ]
+    rows = []
+    for id_, zipcodes, startdate, enddate, category, blocks in permits:
+        for i in range(blocks):
+            rows.append({
+                'id_': id_,
+                'zipcode': zipcodes,
+                'startdate': startdate,
+                'enddate': enddate,
+                'category': category,
+                'subcategory': 'Other',
+                'origin': 'United States of America',
+                'main_st': 'MAIN STREET',
+                'cross_st_1': 'FIRST STREET',
+                'cross_st_2': 'SECOND STREET',
+                'geometry': LineString([(i, 0.5), (i + 0.5, 0.5)])
+            })
+    film_df = gpd.GeoDataFrame(rows)
+
+    monkeypatch.setattr(datasets, 'load_film_df', lambda: film_df)
+    monkeypatch.setattr(datasets, 'load_zip_codes', lambda: zip_codes)
+    filters.load_zipcode_incidence.cache_clear()
+    yield film_df
+    filters.load_zipcode_incidence.cache_clear()
+
+
+def _assert_same_counts(filtered_df):
+    expected = filters.zipcode_counts_groupby(filtered_df)
+    result = filters.zipcode_counts(filtered_df)
+
+    assert list(result.columns) == list(expected.columns)
+    assert result.index.equals(expected.index)
+    np.testing.assert_array_equal(result['permit_count'].to_numpy(), expected['permit_count'].to_numpy())
+
+    return result
+
+
+def test_zipcode_counts_full_range(permit_data):
+    filtered_df = filters.filter_permits(datetime.date(2021, 1, 1), datetime.date(2021, 12, 31), None, None, None)
+    result = _assert_same_counts(filtered_df)
+
+    # Distinct permits, not blocks: '1' holds 3 blocks in 10001
+    assert result.loc['10001', 'permit_count'] == 2
+    assert result.loc['10002', 'permit_count'] == 3
+
+
+def test_zipcode_counts_filtered(permit_data):
+    filtered_df = filters.filter_permits(datetime.date(2021, 1, 2), datetime.date(2021, 2, 1), None, 'Film', None)
+    result = _assert_same_counts(filtered_df)
+
+    assert result['permit_count'].to_dict() == {'10001': 1, '10002': 2, '10003': 1, '11201': 0}
+
+
+def test_zipcode_counts_empty(permit_data):
+    filtered_df = filters.filter_permits(datetime.date(2022, 1, 1), datetime.date(2022, 1, 31), None, None, None)
+    result = _assert_same_counts(filtered_df)
+
+    assert result['permit_count'].sum() == 0
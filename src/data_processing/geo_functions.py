@@ -7,7 +7,7 @@ from shapely.geometry import MultiLineString
 from shapely.geometry import Point
 from shapely.geometry import MultiPoint
 
-import plotly.express as px
+import plotly.graph_objects as go
 
 BORO_DICT = {
     'New York': 'Manhattan',
@@ -107,49 +107,94 @@ def get_held_geometry(row) -> GeometryCollection:
 
     return result
 
-def plot_street(df: gpd.GeoDataFrame, street: str, boro: str, boro_df: gpd.GeoDataFrame):
+class StreetLookup:
+    """
+    Class to look up street geometries by name and borough. The name index and
+    borough-clipped geometries of streets with a 'Missing' borough are built
+    once, and results are cached per (street, borough). Build it once per
+    gazetteer (i.e. lookup = StreetLookup(nyc, boros)) and build a new one
+    after modifying the gazetteer.
+    """
+    def __init__(self, df: gpd.GeoDataFrame, boro_df: gpd.GeoDataFrame):
+        self.names = df['name'].to_numpy()
+        self.boros = df['boros'].to_numpy()
+        self.geometry = df['geometry'].to_numpy()
+        self.index = df.groupby('name').indices
+        self.cache = {}
+
+        # Clip every 'Missing' borough street against each borough once
+        missing = np.flatnonzero([ 'Missing' in x for x in self.boros ])
+        missing_geoms = gpd.GeoSeries(df['geometry'].iloc[missing].to_numpy(), crs=df.crs)
+        self.clipped = {}
+        for boro, boro_geom in zip(boro_df['BoroName'], boro_df['geometry']):
+            clipped = missing_geoms.intersection(boro_geom)
+            for pos, geom in zip(missing, clipped):
+                if not geom.is_empty:
+                    self.clipped.setdefault((self.names[pos], boro), []).append(geom)
+
+    def lookup(self, street: str, boro: str) -> list:
+        """
+        Method to return the geometries of a street within a borough.
+        """
+        key = (street, boro)
+        if key not in self.cache:
+            rows = self.index.get(street, [])
+            geoms = [ self.geometry[i] for i in rows if boro in self.boros[i] ]
+            if len(geoms) < 1:
+                geoms = self.clipped.get(key, [])
+            self.cache[key] = geoms
+
+        return self.cache[key]
+
+    def plot(self, streets: list):
+        """
+        Method to plot many (street, borough) pairs as one figure.
+        """
+        fig = go.Figure()
+
+        for street, boro in streets:
+            lats = []
+            lons = []
+            for feature in self.lookup(street, boro):
+                if isinstance(feature, LineString):
+                    linestrings = [feature]
+                elif isinstance(feature, MultiLineString):
+                    linestrings = feature.geoms
+                else:
+                    continue
+                for linestring in linestrings:
+                    x, y = linestring.xy
+                    lats.extend([np.asarray(y), [None]])
+                    lons.extend([np.asarray(x), [None]])
+
+            fig.add_trace(go.Scattermapbox(
+                mode='lines',
+                lat=np.concatenate(lats) if len(lats) > 0 else [],
+                lon=np.concatenate(lons) if len(lons) > 0 else [],
+                name=f'{street}, {boro}',
+                hoverinfo='name'
+            ))
+
+        fig.update_layout(
+            mapbox={
+                'style': 'carto-positron',
+                'center': {'lat':40.7128, 'lon':-74.006},
+                'zoom': 9
+            },
+            height=750,
+            width=750
+        )
+
+        return fig
+
+def plot_street(lookup: StreetLookup, street: str, boro: str):
     """
     Function to plot a singular street.
     """
-    df = df.loc[df['name'] == street]
-    temp = df.loc[df['boros'].map(lambda x: boro in x)]
-    if len(temp) < 1:
-        temp = df.loc[df['boros'].map(lambda x: 'Missing' in x)].reset_index()
-        if len(temp) > 0:
-            boro_df = boro_df.loc[boro_df['BoroName'] == boro].reset_index()
-            temp = boro_df['geometry'].intersection(temp['geometry']).reset_index().drop(columns='index')
-            temp.columns = ['geometry']
-            temp['name'] = street
-            
-    lats = []
-    lons = []
-    names = []
-
-    for feature, name in zip(temp['geometry'], temp['name']):
-        if isinstance(feature, LineString):
-            linestrings = [feature]
-        elif isinstance(feature, MultiLineString):
-            linestrings = feature.geoms
-        else:
-            continue
-        for linestring in linestrings:
-            x, y = linestring.xy
-            lats = np.append(lats, y)
-            lons = np.append(lons, x)
-            names = np.append(names, [name]*len(y))
-            lats = np.append(lats, None)
-            lons = np.append(lons, None)
-            names = np.append(names, None)
-
-    fig = px.line_mapbox(
-        lat=lats,
-        lon=lons,
-        hover_name=names,
-        mapbox_style='carto-positron', 
-        center={'lat':40.7128, 'lon':-74.006},
-        zoom=9,
-        height=750,
-        width=750
-    )
-
-    fig.show()
\ No newline at end of file
+    lookup.plot([(street, boro)]).show()
+
+def plot_streets(lookup: StreetLookup, streets: list):
+    """
+    Function to plot a list of (street, borough) pairs in a single figure.
+    """
+    lookup.plot(streets).show()
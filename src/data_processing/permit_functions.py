@@ -249,4 +249,30 @@ def create_film_df(film_permits: list) -> pd.DataFrame:
     df.drop(columns='street_dict', inplace=True)
     df['zipcode'] = df['zipcode'].map(lambda x: x.split(', '))
 
-    return df
\ No newline at end of file
+    return df
+
+### App Metadata Function ###
+def create_metadata(df: pd.DataFrame) -> dict:
+    """
+    Function to summarize film permits into the options, date bounds and
+    category to subcategory map the app layout is rendered from.
+    """
+    startdates = pd.to_datetime(df['startdate'])
+    enddates = pd.to_datetime(df['enddate'])
+    subcategories = (
+        df[['category', 'subcategory']]
+        .drop_duplicates()
+        .groupby('category', sort=False)['subcategory']
+        .agg(list)
+    )
+
+    metadata = {
+        'origin_options': ['ALL', *df['origin'].unique()],
+        'category_options': ['ALL', *df['category'].unique()],
+        'calender_options': [ i for i in range(startdates.min().year, enddates.max().year + 1) ],
+        'min_date': startdates.min().strftime('%Y-%m-%d'),
+        'max_date': enddates.max().strftime('%Y-%m-%d'),
+        'subcategories': subcategories.to_dict()
+    }
+
+    return metadata